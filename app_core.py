@@ -1,13 +1,196 @@
 from __future__ import annotations
-import io, os, re, time, json, warnings
+import io, os, re, csv, time, json, codecs, random, hashlib, sqlite3, threading, warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Literal, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
+import xlsxwriter
 
 from pybliometrics.scopus import AbstractRetrieval, AuthorRetrieval, ScopusSearch, SerialTitle
-from pybliometrics.scopus.exception import ScopusException
+from pybliometrics.scopus.exception import Scopus404Error, Scopus429Error, ScopusException
+from pybliometrics.scopus.utils import startup as _scopus_startup
 
 AFF_ID_DEFAULT = "60021379" 
+SCOPUS_MAX_WORKERS = 6
+SCOPUS_REQS_PER_SEC = 8.0  # Abstract Retrieval throttles at 9 req/s per key
+SERIAL_REQS_PER_SEC = 6.0  # Serial Title throttles at 6 req/s per key
+SCOPUS_MAX_RETRIES = 5     # extra attempts after a 429 before giving up
+SCOPUS_BACKOFF_MAX = 60.0  # seconds
+SCOPUS_BREAKER_SECS = 300.0  # after one call exhausts its retries, fail every call fast for this long
+CACHE_DIR = Path(os.environ.get("APP_SCORE_CACHE_DIR", ".scopus_cache"))
+
+_DAY = 86400.0
+ABSTRACT_TTL = 90 * _DAY
+AUTHOR_TTL = 30 * _DAY
+SERIAL_TTL = 30 * _DAY
+SEARCH_TTL = 7 * _DAY
+_CS_CACHE_VERSION = 4  # bump whenever load_citescore_table's output schema changes
+
+_ISSN_STRIP = re.compile(r"[^0-9X]")
+_NUM_RE = re.compile(r"[-+]?\d*\.?\d+")
+_YEAR_RE = re.compile(r"\d{4}")
+_ASJC_SPLIT = re.compile(r"[^0-9]")
+_ISSN_PRINT_RE = re.compile(r"print\s*=\s*'([^']+)'")
+_ISSN_ELEC_RE = re.compile(r"electronic\s*=\s*'([^']+)'")
+
+
+class _RateLimiter:
+    """Thread-safe limiter handing out request slots at least `min_interval` seconds apart."""
+    def __init__(self, min_interval: float = 0.0):
+        self.min_interval = max(float(min_interval or 0.0), 0.0)
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.min_interval: return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now: time.sleep(slot - now)
+
+
+_IN_FLIGHT = threading.BoundedSemaphore(SCOPUS_MAX_WORKERS)
+_BACKOFF_LOCK = threading.Lock()
+_cooldown_until = 0.0  # time.monotonic() before which no thread may call Scopus
+_breaker_until = 0.0   # time.monotonic() before which calls raise Scopus429Error without trying (quota gone)
+
+def _restore_scopus_keys() -> bool:
+    """pybliometrics pops an API key from its process-wide KEYS list on every 429 and never puts it back;
+    once the list is empty every call fails without a request. Refill it in place from the config."""
+    keys = getattr(_scopus_startup, "KEYS", None)
+    if keys is None: return False
+    if not keys:
+        try:
+            keys[:] = [k.strip() for k in _scopus_startup.config.get("Authentication", "APIKey").split(",") if k.strip()]
+        except Exception as e:
+            warnings.warn(f"Could not restore Scopus API keys from config: {e}")
+    return bool(keys)
+
+def _trip_breaker(reason: str) -> None:
+    global _breaker_until
+    with _BACKOFF_LOCK:
+        if _breaker_until <= time.monotonic():
+            warnings.warn(f"Scopus quota looks exhausted ({reason}); failing Scopus calls fast for {SCOPUS_BREAKER_SECS:.0f}s")
+        _breaker_until = time.monotonic() + SCOPUS_BREAKER_SECS
+
+def _scopus_call(fn: Any, *args: Any, **kwargs: Any) -> Any:
+    """Call a pybliometrics constructor, backing off exponentially on 429 (quota/throttle) responses.
+    All callers share one semaphore and one cooldown, so a 429 pauses every thread rather than each sleeping on its own.
+    Once any call runs out of retries the shared breaker opens and later calls fail immediately until it closes."""
+    global _cooldown_until
+    for attempt in range(SCOPUS_MAX_RETRIES + 1):
+        with _BACKOFF_LOCK:
+            now = time.monotonic()
+            if _breaker_until > now: raise Scopus429Error(f"Scopus quota exhausted; retrying in {_breaker_until - now:.0f}s")
+            wait = _cooldown_until - now
+        if wait > 0: time.sleep(wait)
+        if attempt:
+            with _BACKOFF_LOCK:
+                if _breaker_until > time.monotonic(): raise Scopus429Error("Scopus quota exhausted")
+                restored = _restore_scopus_keys()
+            if not restored:
+                _trip_breaker("no API keys left")
+                raise Scopus429Error("no Scopus API keys left to retry with")
+        try:
+            with _IN_FLIGHT:
+                return fn(*args, **kwargs)
+        except Scopus429Error as e:
+            if attempt == SCOPUS_MAX_RETRIES:
+                _trip_breaker(f"{SCOPUS_MAX_RETRIES} retries failed: {e}")
+                raise
+            with _BACKOFF_LOCK:
+                now = time.monotonic()
+                delay = min(SCOPUS_BACKOFF_MAX, 2.0 ** attempt) + random.uniform(0, 1)
+                if now + delay > _cooldown_until:
+                    _cooldown_until = now + delay
+                    warnings.warn(f"Scopus 429 from {getattr(fn, '__name__', fn)}{args}: pausing Scopus calls {delay:.1f}s, retry {attempt + 1}/{SCOPUS_MAX_RETRIES} ({e})")
+
+
+class _DiskCache:
+    """JSON key/value store in SQLite with per-entry expiry, fronted by a bounded in-process LRU."""
+    def __init__(self, path: Path, max_mem: int = 4096, purge_every: int = 1000):
+        self.path = path
+        self.max_mem = max_mem
+        self.purge_every = purge_every  # writes between sweeps of expired rows from SQLite
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._writes = 0
+
+    def _remember(self, key: str, value: Any, exp: Optional[float]) -> None:
+        self._mem[key] = (value, exp)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_mem: self._mem.popitem(last=False)
+
+    def _purge(self, db: sqlite3.Connection) -> None:
+        try:
+            with db:
+                db.execute("DELETE FROM kv WHERE exp IS NOT NULL AND exp <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            warnings.warn(f"Scopus cache purge failed: {e}")
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                self._conn.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL, exp REAL)")
+                self._purge(self._conn)
+            except (OSError, sqlite3.Error) as e:
+                warnings.warn(f"Scopus cache disabled ({self.path}): {e}")
+                self._disabled = True
+        return self._conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.time()
+        out: Dict[str, Any] = {}
+        missing: List[str] = []
+        with self._lock:
+            for k in keys:
+                hit = self._mem.get(k)
+                if hit is not None and (hit[1] is None or hit[1] > now):
+                    out[k] = hit[0]
+                    self._mem.move_to_end(k)
+                    continue
+                if hit is not None: del self._mem[k]  # expired
+                missing.append(k)
+            db = self._db() if missing else None
+            if db is None: return out
+            try:
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i:i+500]
+                    rows = db.execute(f"SELECT k, v, exp FROM kv WHERE k IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                    for k, v, exp in rows:
+                        if exp is not None and exp <= now: continue
+                        out[k] = json.loads(v)
+                        self._remember(k, out[k], exp)
+            except sqlite3.Error as e:
+                warnings.warn(f"Scopus cache read failed: {e}")
+        return out
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        exp = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remember(key, value, exp)
+            db = self._db()
+            if db is None: return
+            try:
+                with db:
+                    db.execute("INSERT OR REPLACE INTO kv (k, v, exp) VALUES (?, ?, ?)", (key, json.dumps(value), exp))
+            except sqlite3.Error as e:
+                warnings.warn(f"Scopus cache write failed for {key}: {e}")
+                return
+            self._writes += 1
+            if self._writes % self.purge_every == 0: self._purge(db)
+
+_CACHE = _DiskCache(CACHE_DIR / "scopus.sqlite3")
 
 
 def _s(x) -> str:
@@ -19,33 +202,49 @@ def _s(x) -> str:
     return x if isinstance(x, str) else str(x)
 
 def _norm_issn(s: str) -> str:
-    return re.sub(r"[^0-9X]", "", _s(s).upper())
+    return _ISSN_STRIP.sub("", _s(s).upper())
+
+def _norm_issn_series(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.upper().str.replace(_ISSN_STRIP, "", regex=True)
 
 def _norm_asjc_codes(raw: Any) -> Set[str]:
     out: Set[str] = set()
     if raw is None: return out
-    it = raw if isinstance(raw, (list, tuple, set)) else re.split(r"[^0-9]", _s(raw))
+    it = raw if isinstance(raw, (list, tuple, set)) else _ASJC_SPLIT.split(_s(raw))
     for tok in it:
         if tok and tok.isdigit():
             out.add(tok[-4:] if len(tok) > 4 else tok if len(tok) == 4 else tok)
     return {t for t in out if len(t) == 4}
 
-def _coerce_percentile(val) -> Optional[float]:
-    txt = _s(val).strip().replace("%","").replace(" ","").replace(",",".")
-    if not txt: return None
-    m = re.search(r"[-+]?\d*\.?\d+", txt)
-    return float(m.group(0)) if m else None
-
-def _coerce_float(val) -> Optional[float]:
-    txt = _s(val).strip().replace(",",".")
-    if not txt: return None
-    m = re.search(r"[-+]?\d*\.?\d+", txt)
-    return float(m.group(0)) if m else None
+def _quartiles_from_percentiles(pct: pd.Series) -> np.ndarray:
+    p = pd.to_numeric(pct, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    out = _QUARTILE_LUT[np.digitize(p, _PCT_BINS)]
+    out[np.isnan(p)] = ""
+    return out
+
+def _asjc_mask(codes: Iterable[str], bits: Dict[str,int]) -> int:
+    # Codes absent from the CiteScore table get no bit; they could never overlap anyway.
+    m = 0
+    for c in codes: m |= bits.get(c, 0)
+    return m
+
+def _coerce_float_series(s: pd.Series, percent: bool = False) -> pd.Series:
+    # First number in each cell ("12,5 %" -> 12.5); vectorised string ops, no Python call per cell.
+    txt = s.fillna("").astype(str)
+    if percent: txt = txt.str.replace("%","",regex=False).str.replace(" ","",regex=False)
+    txt = txt.str.replace(",",".",regex=False)
+    return pd.to_numeric(txt.str.extract(f"({_NUM_RE.pattern})", expand=False), errors="coerce")
+
+# Percentile bands shared by quartile labels and QC: [0,25) [25,50) [50,75) [75,90) [90,100]
+_PCT_BINS = np.array([25.0, 50.0, 75.0, 90.0])
+_QUARTILE_LUT = np.array(["Q4","Q3","Q2","Q1","QT"], dtype=object)
+_QC_LUT = np.array([0.4, 0.6, 0.8, 1.0, 1.4])
 
 def quartile_from_percentile(p: Optional[float]) -> str:
     if p is None: return ""
     try: p = float(p)
     except Exception: return ""
+    if p != p: return ""  # NaN
     if p >= 90: return "QT"
     if p >= 75: return "Q1"
     if p >= 50: return "Q2"
@@ -54,7 +253,7 @@ def quartile_from_percentile(p: Optional[float]) -> str:
 
 def _to_int_year(y: Any) -> Optional[int]:
     try:
-        m = re.search(r"\d{4}", str(y))
+        m = _YEAR_RE.search(str(y))
         return int(m.group(0)) if m else None
     except Exception:
         return None
@@ -65,13 +264,33 @@ def _safe_int(v) -> Optional[int]:
     except Exception:
         return None
 
+_CSV_ENCODINGS = ("utf-8-sig","utf-16","utf-16le","utf-16be","cp1254","iso-8859-9","cp1252","latin1")
+
+def _decode_table_bytes(raw: bytes) -> Tuple[str, str]:
+    # Same preference order as the pandas fallback below, but each candidate costs one strict
+    # decode instead of a full parse. UTF-16 is only plausible with a BOM or NUL bytes.
+    utf16 = raw[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) or b"\x00" in raw[:4096]
+    for enc in _CSV_ENCODINGS:
+        if enc.startswith("utf-16") and not utf16: continue
+        try:
+            return enc, raw.decode(enc)
+        except UnicodeError:
+            continue
+    return "latin1", raw.decode("latin1")
+
 def robust_read_table(path: Path) -> pd.DataFrame:
     if not path.exists():
         raise FileNotFoundError(f"CiteScore file not found: {path}")
     if path.suffix.lower() in (".xlsx",".xls"):
         return pd.read_excel(path)
-    encodings = ["utf-8-sig","utf-16","utf-16le","utf-16be","cp1254","iso-8859-9","cp1252","latin1"]
-    for enc in encodings:
+    enc, text = _decode_table_bytes(path.read_bytes())
+    try:
+        sep = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;\t|").delimiter
+        return pd.read_csv(io.StringIO(text), sep=sep)
+    except Exception as e:
+        warnings.warn(f"Fast CSV parse failed for {path} ({enc}): {e}; retrying with the python engine")
+    del text
+    for enc in _CSV_ENCODINGS:
         try:
             return pd.read_csv(path, encoding=enc, engine="python", sep=None)
         except Exception:
@@ -81,7 +300,41 @@ def robust_read_table(path: Path) -> pd.DataFrame:
     except TypeError:
         return pd.read_csv(path, encoding="latin1", engine="python", sep=None, error_bad_lines=False)  # type: ignore
 
+def _citescore_cache_path(path: Path) -> Path:
+    st = path.stat()
+    tag = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:12]
+    return CACHE_DIR / f"citescore-{tag}-{st.st_mtime_ns}-{st.st_size}-v{_CS_CACHE_VERSION}.pkl"
+
 def load_citescore_table(path: Path) -> pd.DataFrame:
+    # The normalised table is pickled next to the Scopus cache, keyed by file mtime/size,
+    # so warm starts skip CSV sniffing and normalisation entirely.
+    try:
+        cache: Optional[Path] = _citescore_cache_path(path)
+    except OSError:
+        cache = None
+    if cache is not None and cache.exists():
+        try:
+            cs = pd.read_pickle(cache)
+            # pickle writes ints inline, so equal masks come back as separate objects; re-intern them.
+            pool: Dict[int,int] = {}
+            cs["asjc_mask"] = cs["asjc_mask"].map(lambda m: pool.setdefault(m, m))
+            return cs
+        except Exception as e:
+            warnings.warn(f"Ignoring unreadable CiteScore cache {cache}: {e}")
+    cs = _parse_citescore_table(path)
+    if cache is not None:
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            for old in cache.parent.glob(cache.name.rsplit("-", 3)[0] + "-*.pkl"):  # stale versions of this file
+                old.unlink(missing_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            cs.to_pickle(tmp)
+            os.replace(tmp, cache)
+        except OSError as e:
+            warnings.warn(f"Could not write CiteScore cache {cache}: {e}")
+    return cs
+
+def _parse_citescore_table(path: Path) -> pd.DataFrame:
     cs = robust_read_table(path)
     norm = {c.strip().lower(): c for c in cs.columns}
 
@@ -96,184 +349,222 @@ def load_citescore_table(path: Path) -> pd.DataFrame:
 
     cs = cs.rename(columns={p:"print_issn", e:"e_issn", pct:"cs_percentile", val:"citescore"})
     if src: cs = cs.rename(columns={src:"source_id"})
-    cs["asjc_raw"] = cs[asjc_col] if asjc_col else ""
 
     cs["print_issn"] = cs["print_issn"].astype(str)
     cs["e_issn"] = cs["e_issn"].astype(str)
-    cs["cs_percentile"] = cs["cs_percentile"].apply(_coerce_percentile)
-    cs["citescore"] = cs["citescore"].apply(_coerce_float)
+    cs["cs_percentile"] = _coerce_float_series(cs["cs_percentile"], percent=True)
+    cs["citescore"] = _coerce_float_series(cs["citescore"])
     if "source_id" in cs.columns:
         cs["source_id"] = cs["source_id"].astype(str).str.extract(r"(\d+)", expand=False).fillna("")
 
-    cs["issn_key"] = cs["print_issn"].map(_norm_issn)
-    cs["eissn_key"] = cs["e_issn"].map(_norm_issn)
-    cs["asjc_set"] = cs["asjc_raw"].apply(lambda v: frozenset(_norm_asjc_codes(v)))
-
-    keep = ["issn_key","eissn_key","asjc_set","cs_percentile","citescore"]
+    cs["issn_key"] = _norm_issn_series(cs["print_issn"])
+    cs["eissn_key"] = _norm_issn_series(cs["e_issn"])
+    if asjc_col:
+        # Column-wise _norm_asjc_codes: every digit run of 4+ characters, keeping its last 4 digits.
+        toks = cs[asjc_col].fillna("").astype(str).str.findall(r"[0-9]+")
+        asjc_sets = toks.map(lambda L: frozenset(t[-4:] for t in L if len(t) >= 4))
+    else:
+        asjc_sets = pd.Series([frozenset()] * len(cs), index=cs.index, dtype=object)
+    # ASJC sets become int bitmasks over the codes present in this table (~330), so overlap is
+    # popcount(a & b). The code->bit map travels with the frame for the article side.
+    bits = {code: 1 << i for i, code in enumerate(sorted(frozenset().union(*asjc_sets)))}
+    # One mask object per distinct set: equal rows share it (interned), and each is built once.
+    mask_of = {st: _asjc_mask(st, bits) for st in set(asjc_sets)}
+    cs["asjc_mask"] = asjc_sets.map(mask_of)
+
+    keep = ["issn_key","eissn_key","asjc_mask","cs_percentile","citescore"]
     if "source_id" in cs.columns: keep.insert(0,"source_id")
-    return cs[keep]
+    out = cs[keep]
+    out.attrs["asjc_bits"] = bits
+    return out
+
+def _serial_key(issn: str) -> str:
+    return f"serial:{issn}"
 
-def fetch_source_id_for_issn(issn: str) -> Optional[str]:
+def fetch_source_id_for_issn(issn: str, failures: Optional[List[str]] = None) -> Optional[str]:
     issn = _norm_issn(issn)
     if not issn: return None
+    key = _serial_key(issn)
+    cached = _CACHE.get_many([key])
+    if key in cached: return cached[key]
     try:
-        res = SerialTitle(issn)
+        res = _scopus_call(SerialTitle, issn)
         items: Iterable[Any]
         try: items = list(res) if isinstance(res, (list, tuple)) else [res]
         except Exception: items = [res]
+        found: Optional[str] = None
         for it in items:
             for attr in ("source_id","sourcerecord_id","sourceid"):
                 if hasattr(it, attr):
                     sid = _s(getattr(it, attr))
-                    if sid.isdigit(): return sid
-        return None
+                    if sid.isdigit():
+                        found = sid
+                        break
+            if found: break
+    except Scopus404Error:
+        found = None  # unknown ISSN: a definite miss, cached like any other
     except Exception as e:
+        # Throttling and transport errors are transient; leave them uncached so the next run retries.
         warnings.warn(f"SerialTitle lookup failed for ISSN {issn}: {e}")
+        if failures is not None: failures.append(f"SerialTitle {issn}")
         return None
-
-def build_cs_by_source(cs_table: pd.DataFrame, serial_sleep: float = 0.1) -> pd.DataFrame:
-    if "source_id" in cs_table.columns:
-        df = cs_table.copy()
-    else:
-        df = cs_table.copy()
-        df["source_id_from_print"] = df["issn_key"].apply(fetch_source_id_for_issn)
-        if serial_sleep: time.sleep(serial_sleep)
-        df["source_id_from_e"] = df["eissn_key"].apply(fetch_source_id_for_issn)
-        df["source_id"] = df["source_id_from_print"].where(df["source_id_from_print"].notna(), df["source_id_from_e"])
-        df = df.drop(columns=["source_id_from_print","source_id_from_e"], errors="ignore")
-    df = df[df["source_id"].astype(str).str.strip().ne("")].copy()
-    df = df.drop_duplicates(subset=["source_id","asjc_set"], keep="first")
-    return df[["source_id","asjc_set","cs_percentile","citescore"]]
+    _CACHE.set(key, found, ttl=SERIAL_TTL)
+    return found
+
+def _resolve_source_ids(issns: Iterable[str], serial_sleep: float = 0.1, max_workers: int = SCOPUS_MAX_WORKERS, failures: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+    # Each distinct ISSN is looked up once; cached answers skip the pool and the rate limiter.
+    todo = list(dict.fromkeys(i for i in issns if i))
+    cached = _CACHE.get_many(_serial_key(i) for i in todo)
+    out: Dict[str, Optional[str]] = {i: cached[_serial_key(i)] for i in todo if _serial_key(i) in cached}
+    missing = [i for i in todo if i not in out]
+    if missing:
+        limiter = _RateLimiter(max(serial_sleep, 1.0 / SERIAL_REQS_PER_SEC))
+
+        def _fetch(issn: str) -> Optional[str]:
+            limiter.wait()
+            return fetch_source_id_for_issn(issn, failures)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            out.update(zip(missing, pool.map(_fetch, missing)))
+    return out
+
+def build_cs_by_source(cs_table: pd.DataFrame, serial_sleep: float = 0.1, max_workers: int = SCOPUS_MAX_WORKERS, failures: Optional[List[str]] = None) -> pd.DataFrame:
+    df = cs_table.copy()
+    if "source_id" not in df.columns: df["source_id"] = ""
+    df["source_id"] = df["source_id"].fillna("").astype(str).str.strip()
+    # Only rows without a source_id need SerialTitle: print ISSN first, e-ISSN for what is still unresolved.
+    missing = df["source_id"].eq("")
+    if missing.any():
+        p_keys = df.loc[missing, "issn_key"]
+        sid = p_keys.map(_resolve_source_ids(p_keys, serial_sleep, max_workers, failures))
+        unresolved = sid.isna()
+        if unresolved.any():
+            e_keys = df.loc[missing, "eissn_key"][unresolved]
+            sid[unresolved] = e_keys.map(_resolve_source_ids(e_keys, serial_sleep, max_workers, failures))
+        df.loc[missing, "source_id"] = sid.fillna("")
+    df = df[df["source_id"].ne("")]
+    df = df.drop_duplicates(subset=["source_id","asjc_mask"], keep="first")
+    return df[["source_id","asjc_mask","cs_percentile","citescore"]]
+
+def _issns_from_repr(txt: str) -> Tuple[str,str]:
+    # "ISSN(print='...', electronic='...')"
+    mp = _ISSN_PRINT_RE.search(txt); me = _ISSN_ELEC_RE.search(txt)
+    return (mp.group(1) if mp else ""), (me.group(1) if me else "")
+
+def _issns_from_obj(obj: Any) -> Tuple[str,str]:
+    try:
+        return _s(getattr(obj,"print","") or ""), _s(getattr(obj,"electronic","") or "")
+    except Exception:
+        return _issns_from_repr(_s(obj))
 
 def _extract_issns(ar: Any) -> Tuple[str,str]:
-    p = ""; e = ""
-    if hasattr(ar,"eIssn"): e = _s(getattr(ar,"eIssn"))
-    if not e and hasattr(ar,"e_issn"): e = _s(getattr(ar,"e_issn"))
-    if hasattr(ar,"issn"):
-        obj = getattr(ar,"issn")
-        if isinstance(obj,str):
-            if "ISSN(" in obj:
-                mp = re.search(r"print\s*=\s*'([^']+)'", obj)
-                me = re.search(r"electronic\s*=\s*'([^']+)'", obj)
-                if mp: p = mp.group(1)
-                if me and not e: e = me.group(1)
-            else:
-                p = _s(obj)
-        else:
-            try:
-                p_obj = getattr(obj,"print",""); e_obj = getattr(obj,"electronic","")
-                if p_obj: p = _s(p_obj)
-                if not e and e_obj: e = _s(e_obj)
-            except Exception:
-                txt = _s(obj)
-                mp = re.search(r"print\s*=\s*'([^']+)'", txt)
-                me = re.search(r"electronic\s*=\s*'([^']+)'", txt)
-                if mp: p = mp.group(1)
-                if me and not e: e = me.group(1)
-    return p, e
+    e = _s(getattr(ar,"eIssn","")) or _s(getattr(ar,"e_issn",""))
+    if not hasattr(ar,"issn"): return "", e
+    obj = getattr(ar,"issn")
+    if isinstance(obj,str):
+        p, e2 = _issns_from_repr(obj) if "ISSN(" in obj else (obj, "")
+    else:
+        p, e2 = _issns_from_obj(obj)
+    return p, e or e2
 
 def _extract_asjc(ar: Any) -> Tuple[str,str,str,Set[str]]:
     codes: Set[str] = set(); areas: Set[str] = set(); abbr: Set[str] = set()
-    sa = getattr(ar,"subject_areas", None)
-    if sa:
-        try:
-            for it in sa:
-                c = getattr(it,"code",None)
-                a = getattr(it,"area",None)
-                ab = getattr(it,"abbrev",None)
-                if c is not None: codes.add(f"{int(c):04d}" if str(c).isdigit() else str(c))
-                if a: areas.add(_s(a))
-                if ab: abbr.add(_s(ab))
-        except Exception:
-            pass
+    for it in getattr(ar,"subject_areas", None) or ():
+        c = getattr(it,"code",None); a = getattr(it,"area",None); ab = getattr(it,"abbrev",None)
+        if c is not None:
+            c = str(c)
+            codes.add(c.zfill(4) if c.isdigit() else c)
+        if a: areas.add(_s(a))
+        if ab: abbr.add(_s(ab))
     return ", ".join(sorted(codes)), ", ".join(sorted(areas)), ", ".join(sorted(abbr)), codes
 
 
-def _pick_best_candidate(cands: pd.DataFrame, article_asjc: Set[str]) -> Tuple[Optional[float],Optional[float]]:
-    if cands is None or cands.empty: return None, None
-    over = []
-    for _i, row in cands.iterrows():
-        cs_set = row.get("asjc_set") or set()
-        if isinstance(cs_set, (set,frozenset)): cs_set2 = set(cs_set)
-        elif isinstance(cs_set, (list,tuple)): cs_set2 = {str(x) for x in cs_set}
-        else: cs_set2 = _norm_asjc_codes(cs_set)
-        over.append(len(article_asjc & cs_set2))
-    cands = cands.copy()
-    cands["_overlap"] = over
-    cands["_pct"] = cands["cs_percentile"].fillna(-1e9)
-    cands = cands.sort_values(["_overlap","_pct"], ascending=[False,False])
-    top = cands.iloc[0]
-    return top.get("cs_percentile"), top.get("citescore")
+_KINDS = (("source_id","source_id"), ("issn","issn_key"), ("eissn","eissn_key"))
+
+def _long_candidates(cs_table: pd.DataFrame, cs_by_source: pd.DataFrame, wanted: Dict[str,Set[str]]) -> pd.DataFrame:
+    """Stack the three lookup tables into one (kind, key) frame, restricted to the keys the articles use."""
+    parts = []
+    for n, (kind, col) in enumerate(_KINDS):
+        src = cs_by_source if kind == "source_id" else cs_table[[col,"asjc_mask","cs_percentile","citescore"]].drop_duplicates()
+        src = src[src[col].isin(wanted[kind])]
+        parts.append(pd.DataFrame({"kind": n, "key": src[col].to_numpy(), "asjc_mask": src["asjc_mask"].to_numpy(),
+                                   "cs_percentile": src["cs_percentile"].to_numpy(dtype=np.float64, na_value=np.nan),
+                                   "citescore": src["citescore"].to_numpy(dtype=np.float64, na_value=np.nan)}))
+    cands = pd.concat(parts, ignore_index=True)
+    cands["pos"] = np.arange(len(cands))
+    return cands
 
 def enrich_with_citescore_sourceid_asjc(df_articles: pd.DataFrame, cs_table: pd.DataFrame, cs_by_source: pd.DataFrame) -> pd.DataFrame:
     if df_articles is None or df_articles.empty: return df_articles.copy()
-    df = df_articles.copy()
+    df = df_articles.copy(deep=False)  # new columns only; the caller's frame and data are untouched
     for col in ("issn_print","issn_electronic","source_id"):
         if col not in df.columns: df[col] = ""
-    df["issn_key"] = df["issn_print"].astype(str).map(_norm_issn)
-    df["eissn_key"] = df["issn_electronic"].astype(str).map(_norm_issn)
-    a_asjc_sets: List[Set[str]] = [ _norm_asjc_codes(v) for v in df.get("asjc_codes", pd.Series([""]*len(df))) ]
-    cs_p = cs_table[["issn_key","asjc_set","cs_percentile","citescore"]].drop_duplicates()
-    cs_e = cs_table[["eissn_key","asjc_set","cs_percentile","citescore"]].drop_duplicates()
-    out_pct: List[Optional[float]] = []; out_val: List[Optional[float]] = []
-    for idx, row in df.iterrows():
-        article_asjc = a_asjc_sets[idx] if idx < len(a_asjc_sets) else set()
-        sid = _s(row.get("source_id"))
-        pct = None; val = None
-        if sid:
-            cands = cs_by_source[cs_by_source["source_id"].astype(str) == sid]
-            pct, val = _pick_best_candidate(cands, article_asjc)
-        if pct is None and val is None:
-            issn = _s(row.get("issn_key")); eissn = _s(row.get("eissn_key"))
-            cands = pd.concat([ cs_p[cs_p["issn_key"]==issn], cs_e[cs_e["eissn_key"]==eissn] ], ignore_index=True)
-            pct, val = _pick_best_candidate(cands, article_asjc)
-        out_pct.append(pct); out_val.append(val)
+    df["issn_key"] = _norm_issn_series(df["issn_print"])
+    df["eissn_key"] = _norm_issn_series(df["issn_electronic"])
+    bits: Dict[str,int] = cs_table.attrs.get("asjc_bits", {})
+    a_masks = np.array([ _asjc_mask(_norm_asjc_codes(v), bits) for v in df.get("asjc_codes", pd.Series([""]*len(df))) ], dtype=object)
+    # Long form: one row per (article, lookup kind, key). Empty keys are dropped so an article
+    # without an ISSN does not match every journal lacking one.
+    keys = {"source_id": df["source_id"].map(_s).to_numpy(), "issn": df["issn_key"].to_numpy(), "eissn": df["eissn_key"].to_numpy()}
+    arts = pd.concat([pd.DataFrame({"article": np.arange(len(df)), "kind": n, "key": keys[kind]}) for n, (kind, _) in enumerate(_KINDS)], ignore_index=True)
+    arts = arts[arts["key"] != ""]
+    cands = _long_candidates(cs_table, cs_by_source, {kind: set(keys[kind]) - {""} for kind, _ in _KINDS})
+    m = arts.merge(cands, on=["kind","key"], how="inner")
+    out_pct = np.full(len(df), np.nan); out_val = np.full(len(df), np.nan)
+    if not m.empty:
+        art = m["article"].to_numpy()
+        overlap = np.fromiter(((cm & am).bit_count() for cm, am in zip(m["asjc_mask"].to_numpy(), a_masks[art])), dtype=np.int32, count=len(m))
+        # Source-ID matches win outright; otherwise print and electronic ISSN matches compete together.
+        # Within a tier: highest ASJC overlap, then highest percentile (NaN last), then table order.
+        tier = (m["kind"].to_numpy() > 0).astype(np.int8)
+        pct = m["cs_percentile"].to_numpy()
+        order = np.lexsort((m["pos"].to_numpy(), -np.nan_to_num(pct, nan=-np.inf), -overlap, tier, art))
+        first = order[np.r_[True, art[order][1:] != art[order][:-1]]]
+        out_pct[art[first]] = pct[first]
+        out_val[art[first]] = m["citescore"].to_numpy()[first]
     df["cs_percentile"] = out_pct
     df["citescore"] = out_val
-    df["quartile"] = df["cs_percentile"].apply(quartile_from_percentile)
+    df["quartile"] = _quartiles_from_percentiles(df["cs_percentile"])
     return df
 
-def get_author_name(author_id: str) -> str:
+
+def get_author_name(author_id: str, failures: Optional[List[str]] = None) -> str:
+    key = f"author:{author_id}"
+    name = _CACHE.get(key)
+    if name: return name
     try:
-        ar = AuthorRetrieval(author_id)
+        ar = _scopus_call(AuthorRetrieval, author_id)
         name = f"{_s(ar.given_name)} {_s(ar.surname)}".strip()
-        return name or author_id
     except Exception:
+        if failures is not None: failures.append(f"AuthorRetrieval {author_id}")
         return author_id
+    if name: _CACHE.set(key, name, ttl=AUTHOR_TTL)
+    return name or author_id
 
-def get_author_eids(author_id: str) -> List[str]:
+def get_author_eids(author_id: str, failures: Optional[List[str]] = None) -> List[str]:
+    key = f"search:AU-ID({author_id})"
+    eids = _CACHE.get(key)
+    if eids is not None: return eids
     try:
-        s = ScopusSearch(f"AU-ID({author_id})", subscriber=True)
-        return s.get_eids() or []
+        s = _scopus_call(ScopusSearch, f"AU-ID({author_id})", subscriber=True)
+        eids = s.get_eids() or []
     except Exception as e:
         warnings.warn(f"ScopusSearch failed for AU-ID({author_id}): {e}")
+        if failures is not None: failures.append(f"ScopusSearch AU-ID({author_id})")
         return []
+    _CACHE.set(key, eids, ttl=SEARCH_TTL)
+    return eids
 
-def get_article_metadata(eid: str, target_auid: Optional[str] = None, aff_id: Optional[str] = None):
-    try:
-        ar = AbstractRetrieval(eid, view="FULL")
-    except ScopusException as e:
-        warnings.warn(f"AbstractRetrieval failed for {eid}: {e}")
-        return None
+def _parse_abstract(eid: str, ar: Any) -> Optional[Dict[str,Any]]:
     if ar.subtype not in ("ar","re"):
         return None
 
-    is_aff_ok = True
-    if aff_id:
-        is_aff_ok = False
-        groups = getattr(ar, "authorgroup", None)
-        if groups:
-            for g in groups:
-                try:
-                    g_auid = str(getattr(g, "auid", "") or "")
-                    g_aff = _safe_int(getattr(g, "affiliation_id", None))
-                    if target_auid and g_auid == str(target_auid) and g_aff == _safe_int(aff_id):
-                        is_aff_ok = True
-                        break
-                except Exception:
-                    continue
-    if aff_id and not is_aff_ok:
-        return None
+    authorgroup: List[List[Any]] = []
+    for g in getattr(ar, "authorgroup", None) or []:
+        try:
+            authorgroup.append([str(getattr(g, "auid", "") or ""), _safe_int(getattr(g, "affiliation_id", None))])
+        except Exception:
+            continue
 
     year = _s(getattr(ar,"coverDate",""))[:4] if getattr(ar,"coverDate",None) else ""
     issn_print, issn_elec = _extract_issns(ar)
@@ -294,32 +585,70 @@ def get_article_metadata(eid: str, target_auid: Optional[str] = None, aff_id: Op
         "authors_count": len(ar.authors) if getattr(ar,"authors",None) else 1,
         "combined": "; ".join([t for t in (getattr(ar,"authkeywords",[]) or []) if _s(t)]),
         "abstract": _s(getattr(ar,"description","")),
+        "_authorgroup": authorgroup,
     }
 
-def collect_author_articles(author_id: str, aff_id: Optional[str], sleep: float = 0.05) -> pd.DataFrame:
-    eids = get_author_eids(author_id)
+def _abstract_key(eid: str) -> str:
+    return f"abstract:FULL:{eid}"
+
+def _fetch_abstract_record(eid: str) -> Optional[Dict[str,Any]]:
+    # None (non-article subtype) is cached too; retrieval errors propagate and are never cached.
+    key = _abstract_key(eid)
+    cached = _CACHE.get_many([key])
+    if key in cached: return cached[key]
+    rec = _parse_abstract(eid, _scopus_call(AbstractRetrieval, eid, view="FULL"))
+    _CACHE.set(key, rec, ttl=ABSTRACT_TTL)
+    return rec
+
+def _affiliation_ok(rec: Dict[str,Any], target_auid: Optional[str], aff_id: Optional[str]) -> bool:
+    if not aff_id: return True
+    if not target_auid: return False
+    want = _safe_int(aff_id)
+    return any(g_auid == str(target_auid) and g_aff == want for g_auid, g_aff in rec.get("_authorgroup", []))
+
+def _article_from_record(rec: Optional[Dict[str,Any]], target_auid: Optional[str], aff_id: Optional[str]) -> Optional[Dict[str,Any]]:
+    if rec is None or not _affiliation_ok(rec, target_auid, aff_id):
+        return None
+    return {k: v for k, v in rec.items() if not k.startswith("_")}
+
+def get_article_metadata(eid: str, target_auid: Optional[str] = None, aff_id: Optional[str] = None, failures: Optional[List[str]] = None):
+    try:
+        rec = _fetch_abstract_record(eid)
+    except ScopusException as e:
+        warnings.warn(f"AbstractRetrieval failed for {eid}: {e}")
+        if failures is not None: failures.append(f"AbstractRetrieval {eid}")
+        return None
+    return _article_from_record(rec, target_auid, aff_id)
+
+def collect_author_articles(author_id: str, aff_id: Optional[str], sleep: float = 0.05, max_workers: int = SCOPUS_MAX_WORKERS, failures: Optional[List[str]] = None) -> List[Dict[str,Any]]:
+    # Lookups that fail (and are therefore not cached) are appended to `failures` when given.
+    eids = get_author_eids(author_id, failures)
+    # One cache pass up-front; only EIDs missing from it go to the network.
+    cached = _CACHE.get_many(_abstract_key(e) for e in eids)
+    missing = [e for e in eids if _abstract_key(e) not in cached]
+    limiter = _RateLimiter(max(sleep, 1.0 / SCOPUS_REQS_PER_SEC))
+
+    def _fetch(eid: str) -> Optional[Dict[str,Any]]:
+        limiter.wait()
+        return get_article_metadata(eid, target_auid=author_id, aff_id=aff_id, failures=failures)
+
+    fetched: Dict[str, Optional[Dict[str,Any]]] = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            fetched = dict(zip(missing, pool.map(_fetch, missing)))
     recs: List[Dict[str,Any]] = []
     for eid in eids:
-        md = get_article_metadata(eid, target_auid=author_id, aff_id=aff_id)
+        key = _abstract_key(eid)
+        md = _article_from_record(cached[key], author_id, aff_id) if key in cached else fetched.get(eid)
         if md: recs.append(md)
-        if sleep: time.sleep(sleep)
-    return pd.DataFrame(recs)
+    return recs
 
-def _qc_from_percentile(p: Optional[float]) -> Optional[float]:
-    if p is None: return None
-    try: p = float(p)
-    except Exception: return None
-    if p >= 90: return 1.4
-    if p >= 75: return 1.0
-    if p >= 50: return 0.8
-    if p >= 25: return 0.6
-    if p >= 0:  return 0.4
-    return None
-
-def _ac_from_authors(n: Any) -> float:
-    try: n = int(n)
-    except Exception: n = 1
-    return 1.2 if n <= 1 else 1.2 / max(n, 1)
+def _qc_from_percentiles(p: np.ndarray) -> np.ndarray:
+    # NaN and negative percentiles have no QC.
+    return np.where(p >= 0, _QC_LUT[np.digitize(p, _PCT_BINS)], np.nan)
+
+def _ac_from_authors(n: np.ndarray) -> np.ndarray:
+    return np.where(n <= 1, 1.2, 1.2 / np.maximum(n, 1))
 
 def build_app_sheet(df_articles: pd.DataFrame, fixed_years: Optional[Set[int]] = None) -> Tuple[pd.DataFrame, Dict[str,Any]]:
     if df_articles is None or df_articles.empty:
@@ -338,24 +667,25 @@ def build_app_sheet(df_articles: pd.DataFrame, fixed_years: Optional[Set[int]] =
     tmp["authors_count_i"] = pd.to_numeric(tmp.get("authors_count"), errors="coerce").fillna(1).astype(int)
     tmp["subtype_norm"] = tmp.get("subtype","").astype(str).str.lower()
 
-    eligible = tmp[tmp["year_i"].isin(years_ok) & tmp["cs_percentile_num"].notna() & (tmp["subtype_norm"]=="ar")].copy()
-    if eligible.empty:
+    # Columns are computed on `tmp` (the only copy) and rows are filtered once at the end.
+    eligible = tmp["year_i"].isin(years_ok) & tmp["cs_percentile_num"].notna() & (tmp["subtype_norm"]=="ar")
+    if not eligible.any():
         return pd.DataFrame(), {"app_total": 0.0, "eligibility": "No eligible items", "years": sorted(years_ok)}
 
-    eligible["QC"] = eligible["cs_percentile_num"].apply(_qc_from_percentile)
-    eligible["AC"] = eligible["authors_count_i"].apply(_ac_from_authors)
-    eligible = eligible[eligible["QC"].notna()].copy()
-    if eligible.empty:
+    tmp["QC"] = _qc_from_percentiles(tmp["cs_percentile_num"].to_numpy(dtype=np.float64, na_value=np.nan))
+    tmp["AC"] = _ac_from_authors(tmp["authors_count_i"].to_numpy())
+    eligible &= tmp["QC"].notna()
+    if not eligible.any():
         return pd.DataFrame(), {"app_total": 0.0, "eligibility": "No eligible items (QC missing)", "years": sorted(years_ok)}
 
-    eligible["Contribution"] = (eligible["AC"] * eligible["QC"]).round(2)
-    eligible["AC"] = eligible["AC"].round(2)
-    eligible["QC"] = eligible["QC"].round(2)
+    tmp["Contribution"] = (tmp["AC"] * tmp["QC"]).round(2)
+    tmp["AC"] = tmp["AC"].round(2)
+    tmp["QC"] = tmp["QC"].round(2)
 
     out_cols = ["eid","title","year","publication_name","authors_count","cs_percentile","quartile","AC","QC","Contribution"]
     for c in out_cols:
-        if c not in eligible.columns: eligible[c] = pd.Series(dtype="object")
-    df_app = eligible[out_cols].sort_values(["year","Contribution"], ascending=[False, False]).reset_index(drop=True)
+        if c not in tmp.columns: tmp[c] = pd.Series(dtype="object")
+    df_app = tmp.loc[eligible, out_cols].sort_values(["year","Contribution"], ascending=[False, False]).reset_index(drop=True)
 
     app_total = float(df_app["Contribution"].sum().round(2))
     if app_total > 1.0:
@@ -368,45 +698,78 @@ def build_app_sheet(df_articles: pd.DataFrame, fixed_years: Optional[Set[int]] =
     return df_app, {"app_total": round(app_total, 2), "eligibility": elig, "years": sorted(years_ok)}
 
 
+def _write_frame_rows(ws: Any, df: pd.DataFrame, startrow: int = 0, header_fmt: Any = None, chunk: int = 2000) -> None:
+    # Row-major writes (header, then body) so the sheet can stream under constant_memory.
+    ws.write_row(startrow, 0, [str(c) for c in df.columns], header_fmt)
+    row = startrow + 1
+    for i in range(0, len(df), chunk):
+        part = df.iloc[i:i+chunk]
+        for values in part.astype(object).where(part.notna(), None).itertuples(index=False, name=None):
+            ws.write_row(row, 0, values)
+            row += 1
+
+def _write_xlsx(buf: io.BytesIO, merged: pd.DataFrame, app_df: pd.DataFrame, app_summary: Dict[str,Any]) -> None:
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_urls": False})
+    header = wb.add_format({"bold": True})
+    _write_frame_rows(wb.add_worksheet("Articles"), merged, header_fmt=header)
+    if not app_df.empty:
+        ws = wb.add_worksheet("APP")
+        ws.write(0,0,"APP calculation — journal articles (subtype == 'ar')")
+        ws.write(1,0,"Years considered"); ws.write(1,1, ", ".join(str(y) for y in app_summary.get("years",[])))
+        ws.write(2,0,"APP Score"); ws.write(2,1, app_summary.get("app_total",0.0))
+        ws.write(3,0,"Eligibility"); ws.write(3,1, app_summary.get("eligibility",""))
+        _write_frame_rows(ws, app_df, startrow=5, header_fmt=header)
+    wb.close()
+
 def compute_and_build(
     auids: List[str],
     citescore_path: str,
     aff_id: Optional[str] = None,         
     sleep: float = 0.05,
     serial_sleep: float = 0.1,
-    fixed_years: Optional[Set[int]] = None
+    fixed_years: Optional[Set[int]] = None,
+    max_workers: int = SCOPUS_MAX_WORKERS,
+    output_format: Literal["xlsx","csv","parquet"] = "xlsx"
 ) -> Tuple[Dict[str,Any], bytes, str]:
+    if output_format not in ("xlsx","csv","parquet"):
+        raise ValueError(f"Unsupported output_format: {output_format!r}")
     # Varsayılanı BAU yap
     if aff_id is None:
         aff_id = AFF_ID_DEFAULT
 
     cs_path = Path(citescore_path)
     cs_table = load_citescore_table(cs_path)
-    cs_by_source = build_cs_by_source(cs_table, serial_sleep=serial_sleep)
+    # Scopus errors degrade the result instead of raising; they are counted so callers can tell
+    # a complete run from a partial one (and avoid caching the latter).
+    failures: List[str] = []
+    cs_by_source = build_cs_by_source(cs_table, serial_sleep=serial_sleep, max_workers=max_workers, failures=failures)
 
-    all_rows: List[pd.DataFrame] = []
+    # Records from all authors go into one frame and one enrichment pass.
+    records: List[Dict[str,Any]] = []; author_ids: List[str] = []; author_names: List[str] = []
     for au in auids:
-        df = collect_author_articles(au, aff_id=aff_id, sleep=sleep)
-        if not df.empty:
-            df = enrich_with_citescore_sourceid_asjc(df, cs_table, cs_by_source)
-            df["author_id"] = au
-            df["author_name"] = get_author_name(au)
-            all_rows.append(df)
-
-    merged = pd.concat(all_rows, ignore_index=True) if all_rows else pd.DataFrame()
+        recs = collect_author_articles(au, aff_id=aff_id, sleep=sleep, max_workers=max_workers, failures=failures)
+        if recs:
+            records.extend(recs)
+            author_ids.extend([au] * len(recs))
+            author_names.extend([get_author_name(au, failures)] * len(recs))
+
+    merged = pd.DataFrame(records)
+    if not merged.empty:
+        merged = enrich_with_citescore_sourceid_asjc(merged, cs_table, cs_by_source)
+        merged["author_id"] = author_ids
+        merged["author_name"] = author_names
 
     app_df, app_summary = build_app_sheet(merged, fixed_years=fixed_years)
+    app_summary["failures"] = len(failures)
 
-    out_name = "app_results.xlsx"
+    out_name = f"app_results.{output_format}"
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as xl:
-        (merged if not merged.empty else pd.DataFrame()).to_excel(xl, sheet_name="Articles", index=False)
-        if not app_df.empty:
-            app_df.to_excel(xl, sheet_name="APP", index=False, startrow=5)
-            ws = xl.sheets["APP"]
-            ws.write(0,0,"APP calculation — journal articles (subtype == 'ar')")
-            ws.write(1,0,"Years considered"); ws.write(1,1, ", ".join(str(y) for y in app_summary.get("years",[])))
-            ws.write(2,0,"APP Score"); ws.write(2,1, app_summary.get("app_total",0.0))
-            ws.write(3,0,"Eligibility"); ws.write(3,1, app_summary.get("eligibility",""))
+    # csv/parquet carry the Articles table only; the APP score and eligibility are in app_summary.
+    if output_format == "csv":
+        merged.to_csv(buf, index=False, encoding="utf-8-sig")
+    elif output_format == "parquet":
+        merged.to_parquet(buf, index=False, compression="zstd")  # needs pyarrow
+    else:
+        _write_xlsx(buf, merged, app_df, app_summary)
     buf.seek(0)
     return app_summary, buf.read(), out_name
\ No newline at end of file